@@ -0,0 +1,535 @@
+"""
+Motor de indicadores sobre conceptos de ENTRADAS / SALIDAS.
+
+Los indicadores regulatorios (q2, querys_ml, time_querys) se declaran como
+expresiones sobre códigos de concepto en el tiempo, con la misma notación de
+los comentarios de esas queries:
+
+    'L': 'Max[(10920+10930)_t - (10900)_t-1, 0]'
+
+y se calculan para un rango de fechas con UN escaneo pivoteado por tabla
+(SUM(CASE WHEN CONCEPTO = ? ...) con fechas como parámetros), en lugar de
+una query escrita a mano por indicador y por fecha.
+
+Notación:
+    10940_t            concepto en la fecha t
+    10900_t-1          fecha cargada anterior (t+1: la siguiente)
+    10900_{t-1}        igual, con llaves
+    (11121-11122)_t-30d  30 días naturales antes (t+30d: después)
+    ENTRADAS.15964_t   concepto de otra tabla (por defecto: tabla_default)
+    Max[a, b], Min[a, b], Abs(a)   con [] o ()
+
+Un subíndice sobre un grupo aplica a todos sus conceptos; un número sin
+subíndice (p. ej. el 0 de Max[..., 0]) es una constante. Los subíndices van
+pegados al código/paréntesis; deja espacios alrededor de los operadores.
+
+Valores nulos: un concepto sin renglones cuenta como 0 para toda
+(fecha, subsidiaria) de la salida (el COALESCE de las queries), también si
+la fecha pasada (t-1, t-30d) no está cargada. El indicador es NULL solo si
+usa una fecha futura (t+1, t+30d) que aún no está cargada en su tabla: igual
+que el corte por FECHA_MAXIMA de las queries, la validación no aplica.
+
+Diferencias conocidas con las queries originales cuando faltan conceptos:
+la 235 da 2 y las 245-251 dan NULL ("no hay datos") si un concepto no tiene
+renglones, y las que arman el indicador con FROM <primer término> LEFT JOIN
+lo dejan en 0 si falta el primer término; aquí el concepto vale 0 y la
+fórmula se evalúa completa.
+"""
+import re
+import sqlite3
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+
+# ============================================
+# CATÁLOGO
+# ============================================
+
+INDICADORES = {
+    # q2
+    '215_K': '10940_t',
+    '215_L': 'Max[(10920+10930)_t - (10900)_t-1, 0]',
+    '216_M': '10950_t',
+    '216_N': 'Abs(Min[(10920+10930)_t - (10900)_t-1, 0])',
+    # querys_ml
+    '228_AK': '11030_t+1',
+    '228_AL': 'Abs(Min[(11000+11010)_t+1 - (10980)_t, 0])',
+    '232_AS': '11080_t',
+    '232_AT': '11050_t-1',
+    '233_AU': '11050_t',
+    '233_AV': '11080_t+1',
+    '234_AW': '11090_t',
+    '234_AX': 'Max[(11070+11080)_t - (11050)_t-1, 0]',
+    '235_AY': '11100_t',
+    '235_AZ': 'Abs(Min[(11070+11080)_t - (11050)_t-1, 0])',
+    '236_BA': '11090_t+1',
+    '236_BB': 'Max[(11070+11080)_t+1 - (11050)_t, 0]',
+    '237_BC': '11100_t+1',
+    '237_BD': 'Abs(Min[(11070+11080)_t+1 - (11050)_t, 0])',
+    '244_BQ': '11170_t',
+    '244_BR': 'Max[(11121-11122)_t - (11121-11122)_t-30d, 0]',
+    '245_BS': '11180_t',
+    '245_BT': 'Abs(Min[(11121-11122)_t - (11121-11122)_t-30d, 0])',
+    '246_BU': '11170_t+30d',
+    '246_BV': 'Max[(11121-11122)_t+30d - (11121-11122)_t, 0]',
+    '247_BW': '11180_t+30d',
+    '247_BX': 'Abs(Min[(11121-11122)_t+30d - (11121-11122)_t, 0])',
+    '248_CC': '11190_t',
+    '248_CD': 'Max[(11150-11160)_t - (11150-11160)_t-30d - (11170-11180)_t, 0]',
+    '249_CE': '11200_t',
+    '249_CF': 'Abs(Min[(11150-11160)_t - (11150-11160)_t-30d - (11170-11180)_t, 0])',
+    '250_CG': '11190_t+30d',
+    '250_CH': 'Max[(11150-11160)_t+30d - (11150-11160)_t - (11170-11180)_t+30d, 0]',
+    '251_CI': '11200_t+30d',
+    '251_CJ': 'Abs(Min[(11150-11160)_t+30d - (11150-11160)_t - (11170-11180)_t+30d, 0])',
+    # time_querys
+    'TQ_N': '(ENTRADAS.15964 + ENTRADAS.15701 + SALIDAS.10386 + SALIDAS.10393)_t'
+            ' + (ENTRADAS.15964 + ENTRADAS.15701 + SALIDAS.10386 + SALIDAS.10393)_t-1',
+    'TQ_O': 'ENTRADAS.10377_t',
+}
+
+# Códigos de RESULTADO (si cumple, si no cumple), los mismos de cada query:
+# las de fecha t regresan 1/2; las de alerta a futuro, NULL si no detonan
+# y 1 si detonan; la 228 regresa 1/0.
+CUMPLE_NO_CUMPLE = (1, 2)
+ALERTA = (None, 1)
+
+# {id: (regla, indicador_izquierdo, indicador_derecho, códigos)}
+VALIDACIONES = {
+    '215': ('tolerancia', '215_K', '215_L', CUMPLE_NO_CUMPLE),
+    '216': ('tolerancia', '216_M', '216_N', CUMPLE_NO_CUMPLE),
+    '228': ('tolerancia', '228_AK', '228_AL', (1, 0)),
+    '232': ('menor_igual', '232_AS', '232_AT', CUMPLE_NO_CUMPLE),
+    '233': ('mayor_igual', '233_AU', '233_AV', ALERTA),
+    '234': ('tolerancia', '234_AW', '234_AX', CUMPLE_NO_CUMPLE),
+    '235': ('tolerancia', '235_AY', '235_AZ', CUMPLE_NO_CUMPLE),
+    '236': ('tolerancia', '236_BA', '236_BB', ALERTA),
+    '237': ('tolerancia', '237_BC', '237_BD', ALERTA),
+    '244': ('tolerancia', '244_BQ', '244_BR', CUMPLE_NO_CUMPLE),
+    '245': ('tolerancia', '245_BS', '245_BT', CUMPLE_NO_CUMPLE),
+    '246': ('tolerancia', '246_BU', '246_BV', ALERTA),
+    '247': ('tolerancia', '247_BW', '247_BX', ALERTA),
+    '248': ('tolerancia', '248_CC', '248_CD', CUMPLE_NO_CUMPLE),
+    '249': ('tolerancia', '249_CE', '249_CF', CUMPLE_NO_CUMPLE),
+    '250': ('tolerancia', '250_CG', '250_CH', ALERTA),
+    '251': ('tolerancia', '251_CI', '251_CJ', ALERTA),
+    'TQ': ('implica_positivo', 'TQ_N', 'TQ_O', CUMPLE_NO_CUMPLE),
+}
+
+TOLERANCIA = 0.01
+
+
+# ============================================
+# PARSER DE EXPRESIONES
+# ============================================
+
+_TOKEN = re.compile(r"""
+      (?P<espacio>\s+)
+    | (?P<tiempo>_(?:\{[^}]*\}|t(?:[+-]\d+d?)?))
+    | (?P<tabla>[A-Za-z_]\w*)\.(?=\d)
+    | (?P<funcion>[A-Za-z]\w*)
+    | (?P<numero>\d+(?:\.\d+)?)
+    | (?P<simbolo>[-+*/()\[\],])
+""", re.VERBOSE)
+
+_SUBINDICE = re.compile(r"t(?:([+-]\d+)(d?))?")
+_CIERRE = {'(': ')', '[': ']'}
+_FUNCIONES = {'max': 2, 'min': 2, 'abs': 1}
+_TABLA_VALIDA = re.compile(r"[A-Za-z_]\w*")
+
+
+def _tokenizar(expresion):
+    tokens, pos = [], 0
+    while pos < len(expresion):
+        m = _TOKEN.match(expresion, pos)
+        if not m:
+            raise ValueError(f"Carácter inesperado en '{expresion}' (posición {pos}): {expresion[pos]!r}")
+        if m.lastgroup != 'espacio':
+            tokens.append((m.lastgroup, m.group(m.lastgroup)))
+        pos = m.end()
+    return tokens
+
+
+def _leer_subindice(texto):
+    """'_t' → (0, False); '_t-1' → (-1, False); '_{t+30d}' → (30, True)"""
+    limpio = re.sub(r"[\s{}]", "", texto[1:])
+    m = _SUBINDICE.fullmatch(limpio)
+    if not m:
+        raise ValueError(f"Subíndice de tiempo inválido: {texto}")
+    return (int(m.group(1)) if m.group(1) else 0, m.group(2) == 'd')
+
+
+def _con_tiempo(nodo, tiempo):
+    """Aplica el subíndice de un grupo a los conceptos que aún no tienen uno"""
+    tipo = nodo[0]
+    if tipo == 'num' and nodo[1].isdigit():
+        return ('concepto', None, nodo[1], tiempo)
+    if tipo == 'concepto' and nodo[3] is None:
+        return nodo[:3] + (tiempo,)
+    if tipo == 'op':
+        return ('op', nodo[1], _con_tiempo(nodo[2], tiempo), _con_tiempo(nodo[3], tiempo))
+    if tipo == 'neg':
+        return ('neg', _con_tiempo(nodo[1], tiempo))
+    if tipo == 'fn':
+        return ('fn', nodo[1], [_con_tiempo(a, tiempo) for a in nodo[2]])
+    return nodo
+
+
+class _Parser:
+
+    def __init__(self, expresion):
+        self.expresion = expresion
+        self.tokens = _tokenizar(expresion)
+        self.pos = 0
+
+    def _ver(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _tomar(self, valor=None):
+        token = self._ver()
+        if token[0] is None or (valor is not None and token[1] != valor):
+            raise ValueError(f"Se esperaba {valor or 'un término'} en '{self.expresion}'")
+        self.pos += 1
+        return token
+
+    def analizar(self):
+        nodo = self._suma()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Sobra '{self._ver()[1]}' en '{self.expresion}'")
+        return nodo
+
+    def _suma(self):
+        nodo = self._producto()
+        while self._ver()[1] in ('+', '-'):
+            op = self._tomar()[1]
+            nodo = ('op', op, nodo, self._producto())
+        return nodo
+
+    def _producto(self):
+        nodo = self._factor()
+        while self._ver()[1] in ('*', '/'):
+            op = self._tomar()[1]
+            nodo = ('op', op, nodo, self._factor())
+        return nodo
+
+    def _factor(self):
+        if self._ver()[1] == '-':
+            self._tomar()
+            return ('neg', self._factor())
+        if self._ver()[1] == '+':
+            self._tomar()
+            return self._factor()
+
+        nodo = self._primario()
+        if self._ver()[0] == 'tiempo':
+            nodo = _con_tiempo(nodo, _leer_subindice(self._tomar()[1]))
+        return nodo
+
+    def _agrupado(self):
+        apertura = self._tomar()[1]
+        if apertura not in _CIERRE:
+            raise ValueError(f"Se esperaba '(' o '[' en '{self.expresion}'")
+        elementos = [self._suma()]
+        while self._ver()[1] == ',':
+            self._tomar()
+            elementos.append(self._suma())
+        self._tomar(_CIERRE[apertura])
+        return elementos
+
+    def _primario(self):
+        tipo, valor = self._ver()
+        if tipo == 'numero':
+            self._tomar()
+            return ('num', valor)
+        if tipo == 'tabla':
+            self._tomar()
+            codigo = self._tomar()[1]
+            return ('concepto', valor.upper(), codigo, None)
+        if tipo == 'funcion':
+            self._tomar()
+            nombre = valor.lower()
+            if nombre not in _FUNCIONES:
+                raise ValueError(f"Función desconocida '{valor}' en '{self.expresion}'")
+            argumentos = self._agrupado()
+            if (len(argumentos) < 2) if _FUNCIONES[nombre] == 2 else (len(argumentos) != 1):
+                raise ValueError(f"Número de argumentos inválido para {valor} en '{self.expresion}'")
+            return ('fn', nombre, argumentos)
+        if valor in _CIERRE:
+            elementos = self._agrupado()
+            if len(elementos) != 1:
+                raise ValueError(f"Grupo con comas fuera de una función en '{self.expresion}'")
+            return elementos[0]
+        raise ValueError(f"Término inesperado '{valor}' en '{self.expresion}'")
+
+
+def _completar(nodo, tabla_default):
+    """Tabla por defecto y subíndice _t a los conceptos que no lo indicaron"""
+    tipo = nodo[0]
+    if tipo == 'concepto':
+        return ('concepto', nodo[1] or tabla_default, nodo[2], nodo[3] or (0, False))
+    if tipo == 'op':
+        return ('op', nodo[1], _completar(nodo[2], tabla_default), _completar(nodo[3], tabla_default))
+    if tipo == 'neg':
+        return ('neg', _completar(nodo[1], tabla_default))
+    if tipo == 'fn':
+        return ('fn', nodo[1], [_completar(a, tabla_default) for a in nodo[2]])
+    return nodo
+
+
+def _referencias(nodo):
+    """Conjunto de (tabla, concepto, (desplazamiento, en_dias)) usados"""
+    tipo = nodo[0]
+    if tipo == 'concepto':
+        return {nodo[1:]}
+    if tipo == 'op':
+        return _referencias(nodo[2]) | _referencias(nodo[3])
+    if tipo == 'neg':
+        return _referencias(nodo[1])
+    if tipo == 'fn':
+        return set().union(*(_referencias(a) for a in nodo[2]))
+    return set()
+
+
+def analizar_indicador(expresion, tabla_default='SALIDAS'):
+    """
+    Convierte una expresión en su árbol y valida que use al menos un
+    concepto y que las tablas sean identificadores válidos.
+
+    Returns:
+        tuple: (arbol, referencias)
+    """
+    arbol = _completar(_Parser(expresion).analizar(), tabla_default.upper())
+    referencias = _referencias(arbol)
+    if not referencias:
+        raise ValueError(f"La expresión '{expresion}' no usa ningún concepto")
+    for tabla, _, _ in referencias:
+        if not _TABLA_VALIDA.fullmatch(tabla):
+            raise ValueError(f"Nombre de tabla inválido: {tabla}")
+    return arbol, referencias
+
+
+# ============================================
+# CÁLCULO
+# ============================================
+
+def _mover_dias(fecha, dias):
+    return (date.fromisoformat(fecha[:10]) + timedelta(days=dias)).isoformat()
+
+
+def _fechas_cargadas(conn, tabla, desde, hasta, antes, despues):
+    """
+    Fechas cargadas de la tabla dentro del rango, más `antes` fechas previas
+    y `despues` posteriores (para resolver t-n / t+n)
+    """
+    cursor = conn.execute(f"""
+        SELECT FECHA_DATOS FROM (
+            SELECT DISTINCT FECHA_DATOS FROM {tabla}
+            WHERE FECHA_DATOS < ? ORDER BY FECHA_DATOS DESC LIMIT ?
+        )
+        UNION
+        SELECT DISTINCT FECHA_DATOS FROM {tabla} WHERE FECHA_DATOS BETWEEN ? AND ?
+        UNION
+        SELECT FECHA_DATOS FROM (
+            SELECT DISTINCT FECHA_DATOS FROM {tabla}
+            WHERE FECHA_DATOS > ? ORDER BY FECHA_DATOS LIMIT ?
+        )
+        ORDER BY 1
+    """, (desde, antes, desde, hasta, hasta, despues))
+    return [fila[0] for fila in cursor.fetchall()]
+
+
+def _fecha_desplazada(fechas, fecha, desplazamiento):
+    """Fecha cargada a `desplazamiento` posiciones de `fecha` (None si no existe)"""
+    if desplazamiento == 0:
+        return fecha
+    if desplazamiento < 0:
+        i = bisect_left(fechas, fecha) + desplazamiento
+    else:
+        i = bisect_right(fechas, fecha) + desplazamiento - 1
+    return fechas[i] if 0 <= i < len(fechas) else None
+
+
+def _escanear(conn, tabla, conceptos, desde, hasta):
+    """
+    Un solo recorrido de la tabla en [desde, hasta]: un renglón por
+    (FECHA_DATOS, SUBSIDIARIA) con una columna por concepto. No filtra por
+    CONCEPTO para que también salgan las subsidiarias sin esos conceptos.
+    """
+    columnas = ",\n".join(
+        f"            SUM(CASE WHEN CONCEPTO = ? THEN MONTO END) AS C{i}"
+        for i in range(len(conceptos))
+    )
+    df = pd.read_sql(f"""
+        SELECT
+            FECHA_DATOS,
+            SUBSIDIARIA,
+{columnas}
+        FROM {tabla}
+        WHERE FECHA_DATOS BETWEEN ? AND ?
+        GROUP BY FECHA_DATOS, SUBSIDIARIA
+    """, conn, params=(*conceptos, desde, hasta))
+    return df.rename(columns={f"C{i}": c for i, c in enumerate(conceptos)})
+
+
+def _evaluar(nodo, valores):
+    """Valor vectorizado del árbol; NULL se propaga (fecha no cargada)"""
+    tipo = nodo[0]
+    if tipo == 'num':
+        return float(nodo[1])
+    if tipo == 'concepto':
+        return valores[nodo[1:]]
+    if tipo == 'neg':
+        return -_evaluar(nodo[1], valores)
+    if tipo == 'op':
+        a, b = _evaluar(nodo[2], valores), _evaluar(nodo[3], valores)
+        if nodo[1] == '+':
+            return a + b
+        if nodo[1] == '-':
+            return a - b
+        if nodo[1] == '*':
+            return a * b
+        return a / b
+    # fn
+    argumentos = [_evaluar(a, valores) for a in nodo[2]]
+    if nodo[1] == 'abs':
+        return abs(argumentos[0])
+    return reduce(np.maximum if nodo[1] == 'max' else np.minimum, argumentos)
+
+
+def calcular_indicadores(conn, desde, hasta, indicadores=None, tabla_default='SALIDAS'):
+    """
+    Calcula todos los indicadores para cada fecha de [desde, hasta].
+
+    Args:
+        conn: conexión sqlite3 con las tablas de conceptos
+        desde, hasta (str): fechas 'YYYY-MM-DD' (inclusivas)
+        indicadores (dict): {nombre: expresión}; por defecto INDICADORES
+        tabla_default (str): tabla de los conceptos sin prefijo
+
+    Returns:
+        DataFrame: un renglón por (FECHA_DATOS, SUBSIDIARIA) con datos en
+        alguna de las tablas usadas, y una columna por indicador
+    """
+    indicadores = INDICADORES if indicadores is None else indicadores
+    arboles = {}
+    por_tabla = {}
+    for nombre, expresion in indicadores.items():
+        arboles[nombre], referencias = analizar_indicador(expresion, tabla_default)
+        for tabla, concepto, tiempo in referencias:
+            uso = por_tabla.setdefault(tabla, {'conceptos': set(), 'tiempos': set()})
+            uso['conceptos'].add(concepto)
+            uso['tiempos'].add(tiempo)
+
+    # 1. Rango de fechas a leer por tabla (t-n / t+n se resuelven con sus fechas cargadas)
+    for tabla, uso in por_tabla.items():
+        cargados = [d for d, en_dias in uso['tiempos'] if not en_dias]
+        dias = [d for d, en_dias in uso['tiempos'] if en_dias] or [0]
+        inicio, fin = _mover_dias(desde, min(dias)), _mover_dias(hasta, max(dias))
+
+        uso['fechas'] = []
+        if any(cargados):
+            antes, despues = max(0, -min(cargados)), max(0, max(cargados))
+            uso['fechas'] = _fechas_cargadas(conn, tabla, desde, hasta, antes, despues)
+            if uso['fechas']:
+                inicio = min(inicio, uso['fechas'][0])
+                fin = max(fin, uso['fechas'][-1])
+        uso['rango'] = (inicio, fin)
+
+    # 2. Un escaneo pivoteado por tabla
+    escaneos = {
+        tabla: _escanear(conn, tabla, sorted(uso['conceptos']), *uso['rango'])
+        for tabla, uso in por_tabla.items()
+    }
+
+    # 3. Renglones de salida: (fecha, subsidiaria) con datos en alguna tabla
+    base = pd.concat([
+        df.loc[df['FECHA_DATOS'].between(desde, hasta), ['FECHA_DATOS', 'SUBSIDIARIA']]
+        for df in escaneos.values()
+    ]).drop_duplicates().sort_values(['FECHA_DATOS', 'SUBSIDIARIA'], ignore_index=True)
+
+    # 4. Alinear cada (tabla, tiempo) con los renglones de salida: concepto
+    #    sin renglones = 0, salvo que la fecha futura referida no esté cargada
+    valores = {}
+    fechas_salida = base['FECHA_DATOS'].unique()
+    for tabla, uso in por_tabla.items():
+        conceptos = sorted(uso['conceptos'])
+        fechas_tabla = set(escaneos[tabla]['FECHA_DATOS'])
+        for tiempo in uso['tiempos']:
+            desplazamiento, en_dias = tiempo
+            if en_dias:
+                referencia = {f: _mover_dias(f, desplazamiento) for f in fechas_salida}
+            else:
+                referencia = {f: _fecha_desplazada(uso['fechas'], f, desplazamiento) for f in fechas_salida}
+
+            alineado = base.assign(FECHA_REF=base['FECHA_DATOS'].map(referencia)).merge(
+                escaneos[tabla].rename(columns={'FECHA_DATOS': 'FECHA_REF'}),
+                on=['FECHA_REF', 'SUBSIDIARIA'],
+                how='left'
+            )
+            cargada = alineado['FECHA_REF'].isin(fechas_tabla) | (desplazamiento <= 0)
+            for concepto in conceptos:
+                valores[(tabla, concepto, tiempo)] = alineado[concepto].astype(float).fillna(0).where(cargada)
+
+    # 5. Evaluar las expresiones vectorizadas
+    for nombre, arbol in arboles.items():
+        base[nombre] = _evaluar(arbol, valores)
+
+    return base
+
+
+# ============================================
+# VALIDACIONES
+# ============================================
+
+def _cumple(regla, izquierda, derecha):
+    if regla == 'tolerancia':
+        return izquierda.between(derecha * (1 - TOLERANCIA), derecha * (1 + TOLERANCIA))
+    if regla == 'menor_igual':
+        return izquierda <= derecha
+    if regla == 'mayor_igual':
+        return izquierda >= derecha
+    if regla == 'implica_positivo':
+        return (izquierda <= 0) | (derecha > 0)
+    raise ValueError(f"Regla de validación desconocida: {regla}")
+
+
+def evaluar_validaciones(df, validaciones=None):
+    """
+    Agrega una columna RESULTADO_<id> por validación con los códigos de su
+    query (ver VALIDACIONES). Es NULL si no aplica: alguno de los
+    indicadores usa una fecha no cargada (t+1 / t+30d aún sin datos).
+    """
+    validaciones = VALIDACIONES if validaciones is None else validaciones
+    df = df.copy()
+    for id_validacion, (regla, izq, der, (si_cumple, no_cumple)) in validaciones.items():
+        aplica = df[izq].notna() & df[der].notna()
+        cumple = _cumple(regla, df[izq], df[der])
+        resultado = pd.Series(pd.NA, index=df.index, dtype='Int64')
+        if si_cumple is not None:
+            resultado[aplica & cumple] = si_cumple
+        if no_cumple is not None:
+            resultado[aplica & ~cumple] = no_cumple
+        df[f"RESULTADO_{id_validacion}"] = resultado
+    return df
+
+
+# EJEMPLO DE USO
+if __name__ == "__main__":
+    # Configuración
+    db_path = r'C:\Users\thede\OneDrive\Escritorio\conceptos.db'
+    desde, hasta = '2024-01-01', '2024-01-31'
+
+    conn = sqlite3.connect(db_path)
+    try:
+        resultado = evaluar_validaciones(calcular_indicadores(conn, desde, hasta))
+    finally:
+        conn.close()
+
+    columnas_resultado = [c for c in resultado.columns if c.startswith('RESULTADO_')]
+    print(f"Renglones (fecha, subsidiaria): {len(resultado)}")
+    for columna in columnas_resultado:
+        print(columna, resultado[columna].value_counts(dropna=False).to_dict())
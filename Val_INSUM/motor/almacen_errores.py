@@ -0,0 +1,283 @@
+# almacen_errores.py
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+ESQUEMA_ERRORES = pa.schema([
+    ("id_parte", pa.int64()),
+    ("id_rango", pa.int64()),
+    ("id_val", pa.int64()),
+    ("fila", pa.string())
+])
+
+ESQUEMA_REFERENCIAS = pa.schema([
+    ("id_parte", pa.int64()),
+    ("id_rango", pa.int64()),
+    ("id_val", pa.int64()),
+    ("origen", pa.string())
+])
+
+
+def nuevo_run_id():
+    """Identificador de corrida; ordena cronológicamente como texto"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+class AlmacenErrores:
+    """
+    Dataset único de filas con error, de solo escritura.
+
+    Estructura (particionado estilo hive):
+
+        errores/
+          id_insumo=1/
+            run_id=20260303_180000_ab12cd/
+              part-00000.parquet
+              referencias.parquet
+
+    Los part-N.parquet tienen el esquema fijo (id_parte, id_rango, id_val,
+    fila), donde `fila` es el registro con error serializado en JSON. Las
+    filas de cada regla llegan de DuckDB por lotes Arrow y se acumulan por
+    partición solo hasta completar un row group, que se escribe ordenado
+    por id_val en el archivo abierto de la partición. Así una corrida deja
+    un archivo por partición (o pocos, acotados por `filas_por_archivo`) y
+    la memoria queda acotada por `filas_por_grupo`. El archivo se escribe
+    como .tmp y se publica al cerrarlo.
+
+    Las reglas que la corrida respondió desde el ledger no vuelven a
+    escribir sus filas: referencias.parquet guarda (id_parte, id_rango,
+    id_val, origen) apuntando a la partición de la corrida que las tiene.
+    """
+
+    def __init__(self, ruta_base="errores", filas_por_grupo=128_000,
+                 filas_por_archivo=10_000_000):
+        self.ruta_base = Path(ruta_base)
+        self.filas_por_grupo = filas_por_grupo
+        self.filas_por_archivo = filas_por_archivo
+
+        self._buffers = {}
+        self._escritores = {}
+        self._secuencias = {}
+        self._referencias = {}
+        self._candado = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cerrar()
+
+    # ================================
+    # ESCRITURA
+    # ================================
+
+    def ruta_particion(self, run_id, id_insumo):
+        return self.ruta_base / f"id_insumo={id_insumo}" / f"run_id={run_id}"
+
+    def agregar(self, conn, query, run_id, id_insumo, id_parte, id_rango, id_val):
+        """
+        Agrega a la partición de la corrida las filas que regresa `query`
+        (ejecutada en `conn`). Regresa la ruta de la partición.
+        """
+
+        query = query.strip().rstrip(";")
+        lector = conn.execute(f"""
+            SELECT {int(id_parte)}::BIGINT AS id_parte,
+                   {int(id_rango)}::BIGINT AS id_rango,
+                   {int(id_val)}::BIGINT AS id_val,
+                   to_json(regla)::VARCHAR AS fila
+            FROM ({query}) AS regla
+        """).fetch_record_batch(self.filas_por_grupo)
+
+        llave = (run_id, id_insumo)
+
+        for lote in lector:
+            tabla = pa.Table.from_batches([lote]).cast(ESQUEMA_ERRORES)
+
+            with self._candado:
+                buffer = self._buffers.setdefault(llave, [])
+                buffer.append(tabla)
+
+                if sum(t.num_rows for t in buffer) >= self.filas_por_grupo:
+                    self._vaciar(llave)
+
+        return self.ruta_particion(run_id, id_insumo)
+
+    def referenciar(self, run_id, id_insumo, id_parte, id_rango, id_val, origen):
+        """
+        Registra en la corrida una regla respondida desde el ledger; `origen`
+        es la partición (o el Parquet) donde ya están sus filas.
+        """
+
+        with self._candado:
+            self._referencias.setdefault((run_id, id_insumo), []).append(
+                (int(id_parte), int(id_rango), int(id_val), str(origen))
+            )
+
+    def cerrar(self):
+        with self._candado:
+            for llave in list(self._buffers):
+                self._vaciar(llave)
+
+            for llave in list(self._escritores):
+                self._publicar(llave)
+
+            for llave, filas in self._referencias.items():
+                ruta = self.ruta_particion(*llave)
+                ruta.mkdir(parents=True, exist_ok=True)
+
+                tabla = pa.Table.from_pylist(
+                    [dict(zip(ESQUEMA_REFERENCIAS.names, fila)) for fila in filas],
+                    schema=ESQUEMA_REFERENCIAS
+                )
+                pq.write_table(tabla, ruta / "referencias.parquet", compression="zstd")
+
+            self._referencias.clear()
+
+    def _vaciar(self, llave):
+        """Escribe el buffer de la partición como un row group ordenado por id_val"""
+
+        buffer = self._buffers.pop(llave, [])
+        if not buffer:
+            return
+
+        tabla = pa.concat_tables(buffer).sort_by("id_val")
+
+        if llave in self._escritores and self._escritores[llave][2] >= self.filas_por_archivo:
+            self._publicar(llave)
+
+        if llave not in self._escritores:
+            ruta = self.ruta_particion(*llave)
+            ruta.mkdir(parents=True, exist_ok=True)
+
+            secuencia = self._secuencias.get(llave, 0)
+            self._secuencias[llave] = secuencia + 1
+
+            destino = ruta / f"part-{secuencia:05d}.parquet"
+            temporal = destino.with_name(destino.name + ".tmp")
+            escritor = pq.ParquetWriter(temporal, ESQUEMA_ERRORES, compression="zstd")
+            self._escritores[llave] = [escritor, destino, 0]
+
+        escritor, _, filas = self._escritores[llave]
+        escritor.write_table(tabla, row_group_size=self.filas_por_grupo)
+        self._escritores[llave][2] = filas + tabla.num_rows
+
+    def _publicar(self, llave):
+        """Cierra el archivo abierto de la partición y lo hace visible"""
+
+        escritor, destino, _ = self._escritores.pop(llave)
+        escritor.close()
+        os.replace(destino.with_name(destino.name + ".tmp"), destino)
+
+    # ================================
+    # CONSULTA
+    # ================================
+
+    def consultar_regla(self, id_val, ultimas_n=5, id_insumo=None):
+        """
+        Errores de la regla `id_val` en las últimas N corridas.
+        Solo se listan carpetas de partición y se leen los archivos de esas
+        N corridas; dentro de cada archivo DuckDB filtra por id_val.
+
+        Si una corrida tomó la regla del ledger, sus filas se leen de la
+        partición de origen y se reportan con el run_id de esa corrida
+        (run_id_origen dice dónde se escribieron).
+        """
+
+        if id_insumo is None:
+            insumos = [p for p in self.ruta_base.glob("id_insumo=*") if p.is_dir()]
+        else:
+            insumos = [self.ruta_base / f"id_insumo={id_insumo}"]
+
+        corridas = sorted(
+            (p for insumo in insumos if insumo.is_dir() for p in insumo.iterdir()
+             if p.is_dir() and p.name.startswith("run_id=")),
+            key=lambda p: p.name,
+            reverse=True
+        )
+
+        run_ids = sorted({p.name for p in corridas}, reverse=True)[:ultimas_n]
+        corridas = [corrida for corrida in corridas if corrida.name in run_ids]
+
+        archivos = [
+            str(archivo)
+            for corrida in corridas
+            for archivo in corrida.glob("part-*.parquet")
+        ]
+        referencias = [
+            str(corrida / "referencias.parquet")
+            for corrida in corridas
+            if (corrida / "referencias.parquet").exists()
+        ]
+
+        with duckdb.connect(":memory:") as conn:
+
+            conn.execute("""
+                CREATE TEMP TABLE referencias (
+                    run_id VARCHAR, id_insumo BIGINT,
+                    id_parte BIGINT, id_rango BIGINT, archivo VARCHAR
+                )
+            """)
+
+            if referencias:
+                pendientes = conn.execute("""
+                    SELECT DISTINCT run_id::VARCHAR, id_insumo, id_parte, id_rango, origen
+                    FROM read_parquet(?, hive_partitioning = true)
+                    WHERE id_val = ?
+                """, (referencias, id_val)).fetchall()
+
+                # Solo particiones del almacén; un Parquet suelto por regla
+                # (corridas sin almacén) no tiene el esquema del dataset
+                filas = [
+                    (run_id, insumo, parte, rango, str(archivo))
+                    for run_id, insumo, parte, rango, origen in pendientes
+                    if Path(origen).is_dir()
+                    for archivo in Path(origen).glob("part-*.parquet")
+                ]
+                if filas:
+                    conn.executemany("INSERT INTO referencias VALUES (?, ?, ?, ?, ?)", filas)
+
+            origenes = [fila[0] for fila in conn.execute(
+                "SELECT DISTINCT archivo FROM referencias"
+            ).fetchall()]
+
+            if not archivos and not origenes:
+                return None
+
+            consultas = []
+            parametros = []
+
+            if archivos:
+                consultas.append("""
+                    SELECT run_id::VARCHAR AS run_id, run_id::VARCHAR AS run_id_origen,
+                           id_insumo, id_parte, id_rango, id_val, fila
+                    FROM read_parquet(?, hive_partitioning = true)
+                    WHERE id_val = ?
+                """)
+                parametros += [archivos, id_val]
+
+            if origenes:
+                consultas.append("""
+                    SELECT r.run_id, e.run_id::VARCHAR AS run_id_origen,
+                           r.id_insumo, e.id_parte, e.id_rango, e.id_val, e.fila
+                    FROM read_parquet(?, hive_partitioning = true, filename = true) AS e
+                    JOIN referencias AS r
+                      ON e.filename = r.archivo
+                     AND e.id_parte = r.id_parte
+                     AND e.id_rango = r.id_rango
+                    WHERE e.id_val = ?
+                """)
+                parametros += [origenes, id_val]
+
+            return conn.execute(
+                "\nUNION ALL\n".join(consultas) +
+                "\nORDER BY run_id DESC, id_parte, id_rango",
+                parametros
+            ).pl()
@@ -0,0 +1,223 @@
+# benchmark.py
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from generador_insumos import FILAS_MAX_EXCEL, GeneradorInsumos
+
+
+EXTENSIONES = {"CSV": ".csv", "TXT": ".txt", "EXCEL": ".xlsx"}
+
+
+def memoria_pico_mb():
+    """Pico de RSS del proceso actual en MB (None si no se puede medir)"""
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+
+def version_codigo():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True, text=True, cwd=Path(__file__).parent
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# ================================
+# CASO (se ejecuta en un subproceso)
+# ================================
+
+def ejecutar_caso(ruta_db, id_insumo):
+    """
+    Corre OrquestadorInsumo.procesar de punta a punta en un directorio
+    temporal. Va en un proceso aparte para que el pico de memoria sea
+    solo el de este caso.
+    """
+
+    ruta_db = Path(ruta_db).resolve()
+    origen = os.getcwd()
+
+    # Logs, caché y errores del caso se borran al terminar
+    with tempfile.TemporaryDirectory(prefix="bench_motor_") as directorio:
+        os.chdir(directorio)
+        try:
+            from orquestador import OrquestadorInsumo
+
+            inicio = time.perf_counter()
+            salida = OrquestadorInsumo(
+                id_insumo=id_insumo,
+                ruta_db=str(ruta_db),
+                ruta_errores=str(Path(directorio) / "errores")
+            ).procesar()
+            total_ms = (time.perf_counter() - inicio) * 1000
+
+            with open(salida["log"], encoding="utf-8") as f:
+                rangos = json.load(f)
+        finally:
+            # Fuera del directorio antes de borrarlo (Windows no borra el cwd)
+            os.chdir(origen)
+
+    reglas = [r for rango in rangos for r in rango.get("reglas", [])]
+
+    return {
+        "total_ms": round(total_ms, 3),
+        "tiempos": salida["tiempos"],
+        "memoria_pico_mb": memoria_pico_mb(),
+        "reglas_con_error": len(reglas),
+        "errores_detectados": sum(r["total_errores"] for r in reglas if r["total_errores"] > 0),
+        "reglas_fusionadas": sum(r["resumen"].get("reglas_fusionadas", 0) for r in rangos)
+    }
+
+
+# ================================
+# SUITE
+# ================================
+
+def correr_suite(filas, tipos, tasa_error, carpeta_datos, repeticiones):
+
+    generador = GeneradorInsumos(tasa_error=tasa_error)
+    casos = []
+
+    for tipo in tipos:
+        for n in filas:
+
+            if tipo == "EXCEL" and n > FILAS_MAX_EXCEL:
+                print(f"  · {tipo} {n:,} filas: omitido (límite de Excel)")
+                continue
+
+            archivo = Path(carpeta_datos) / f"insumo_{n}_{tasa_error}{EXTENSIONES[tipo]}"
+            if not archivo.exists():
+                print(f"  · Generando {archivo.name}...")
+                generador.generar(archivo, tipo, n)
+
+            ruta_db = Path(carpeta_datos) / f"config_{tipo}_{n}.duckdb"
+            generador.crear_config(ruta_db, archivo, tipo)
+
+            for repeticion in range(repeticiones):
+
+                proceso = subprocess.run(
+                    [sys.executable, __file__, "--caso", str(ruta_db)],
+                    capture_output=True, text=True, cwd=Path(__file__).parent
+                )
+
+                if proceso.returncode != 0:
+                    print(proceso.stderr, file=sys.stderr)
+                    raise RuntimeError(f"Falló el caso {tipo} {n}")
+
+                resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+                resultado.update({
+                    "caso": f"{tipo}_{n}",
+                    "tipo_archivo": tipo,
+                    "filas": n,
+                    "tasa_error": tasa_error,
+                    "repeticion": repeticion,
+                    "tamano_mb": round(archivo.stat().st_size / (1024 * 1024), 2)
+                })
+                casos.append(resultado)
+
+                print(f"  ✔ {tipo:5} {n:>11,} filas | total {resultado['total_ms']:>10.0f} ms"
+                      f" | RSS {resultado['memoria_pico_mb']} MB")
+
+    return casos
+
+
+def comparar(actual, base, tolerancia):
+    """Marca como regresión los casos cuyo total empeora más que la tolerancia"""
+
+    def mejor_por_caso(corrida):
+        mejores = {}
+        for c in corrida["casos"]:
+            if c["caso"] not in mejores or c["total_ms"] < mejores[c["caso"]]["total_ms"]:
+                mejores[c["caso"]] = c
+        return mejores
+
+    mejores_actual = mejor_por_caso(actual)
+    mejores_base = mejor_por_caso(base)
+
+    regresiones = []
+    for caso, c in mejores_actual.items():
+        b = mejores_base.get(caso)
+        if not b:
+            continue
+
+        razon = c["total_ms"] / b["total_ms"] if b["total_ms"] else 1
+        marca = "⚠ REGRESIÓN" if razon > 1 + tolerancia else ""
+        print(f"  {caso:20} {b['total_ms']:>10.0f} → {c['total_ms']:>10.0f} ms ({razon:.2f}x) {marca}")
+
+        if marca:
+            regresiones.append(caso)
+
+    return regresiones
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark del motor de validación")
+    parser.add_argument("--filas", type=int, nargs="+",
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--tipos", nargs="+", default=["CSV", "TXT", "EXCEL"],
+                        choices=list(EXTENSIONES))
+    parser.add_argument("--tasa-error", type=float, default=0.01)
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--datos", default="bench_datos",
+                        help="Carpeta de insumos sintéticos (se reutilizan)")
+    parser.add_argument("--salida", default="bench_resultados")
+    parser.add_argument("--comparar", default=None,
+                        help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.15)
+    parser.add_argument("--caso", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.caso:
+        print(json.dumps(ejecutar_caso(args.caso, 1)))
+        sys.exit(0)
+
+    Path(args.datos).mkdir(parents=True, exist_ok=True)
+
+    corrida = {
+        "fecha": datetime.now().isoformat(),
+        "version": version_codigo(),
+        "maquina": {
+            "sistema": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count()
+        },
+        "casos": correr_suite(args.filas, args.tipos, args.tasa_error,
+                              args.datos, args.repeticiones)
+    }
+
+    salida = Path(args.salida)
+    salida.mkdir(parents=True, exist_ok=True)
+    archivo = salida / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+
+    with open(archivo, "w", encoding="utf-8") as f:
+        json.dump(corrida, f, indent=4)
+
+    print(f"\n📁 Resultados: {archivo}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+
+        print(f"\nComparación contra {args.comparar}:")
+        if comparar(corrida, base, args.tolerancia):
+            sys.exit(1)
@@ -1,11 +1,19 @@
 # config_repository.py
+import os
+from pathlib import Path
+
 import duckdb
+import polars as pl
+
+from plan_configuracion import MAPEO_TIPOS, PlanConfiguracion
 
 
 class ConfigRepository:
 
-    def __init__(self, ruta_db):
+    def __init__(self, ruta_db, ruta_cache="cache_config", max_planes=20):
         self.ruta_db = ruta_db
+        self.ruta_cache = Path(ruta_cache) if ruta_cache else None
+        self.max_planes = max_planes
         self.conn = None
 
     def __enter__(self):
@@ -27,6 +35,15 @@ class ConfigRepository:
             WHERE ID_INSUMO = ?
         """, (id_insumo,)).fetchone()
 
+    def obtener_insumos_activos(self):
+        return [r[0] for r in self.conn.execute("""
+            SELECT DISTINCT c.ID_INSUMO
+            FROM CAT_INSUMOS c
+            JOIN INSUMOS_PARTES p ON p.ID_INSUMO = c.ID_INSUMO
+            WHERE p.ESTATUS = TRUE
+            ORDER BY c.ID_INSUMO
+        """).fetchall()]
+
     # ================================
     # PARTES
     # ================================
@@ -68,18 +85,9 @@ class ConfigRepository:
             ORDER BY INDEX_COL
         """, (id_rango,)).fetchall()
 
-        import polars as pl
-
-        mapeo = {
-            "INT": pl.Int64,
-            "STRING": pl.Utf8,
-            "DATE": pl.Utf8,
-            "FLOAT": pl.Float64
-        }
-
         schema = {}
         for _, nombre, tipo in columnas:
-            schema[nombre] = mapeo.get(tipo, pl.Utf8)
+            schema[nombre] = MAPEO_TIPOS.get(tipo, pl.Utf8)
 
         return schema
 
@@ -100,3 +108,85 @@ class ConfigRepository:
               AND TIPO_VAL = 'SLA'
               AND ESTATUS = TRUE
         """, (id_insumo,)).fetchall()
+
+    # ================================
+    # PLAN COMPLETO (CARGA MASIVA)
+    # ================================
+
+    def cargar_plan(self, ids_insumos=None):
+        """
+        Carga la configuración de uno o varios insumos con tres consultas
+        en lugar de una por parte / rango. El resultado se guarda en disco
+        con la versión de la configuración como llave; solo se conservan
+        los max_planes usados más recientemente.
+        """
+
+        archivo = None
+        if self.ruta_cache:
+            version = PlanConfiguracion.version(self.ruta_db, ids_insumos)
+            archivo = self.ruta_cache / f"plan_{version}.pkl"
+
+            if archivo.exists():
+                os.utime(archivo)
+                return PlanConfiguracion.cargar(archivo)
+
+        ids = list(ids_insumos or self.obtener_insumos_activos())
+
+        filas = {
+            "insumos": self.conn.execute("""
+                SELECT ID_INSUMO, RUTA_ARCHIVO, TIPO_ARCHIVO
+                FROM CAT_INSUMOS
+                WHERE ID_INSUMO IN (SELECT UNNEST(?))
+                ORDER BY ID_INSUMO
+            """, (ids,)).fetchall(),
+
+            "estructura": self.conn.execute("""
+                SELECT p.ID_INSUMO, p.ID_PARTE, p.NOMBRE_PARTE,
+                       r.ID_RANGO, r.COL_INICIO, r.COL_FIN,
+                       d.NOMBRE_COLUMN, d.TIPO_DATO_SYS
+                FROM INSUMOS_PARTES p
+                JOIN INSUMOS_RANGOS r
+                  ON r.ID_PARTE = p.ID_PARTE
+                 AND r.ESTATUS = TRUE
+                LEFT JOIN DEFINICION_INSUMOS d
+                  ON d.ID_RANGO = r.ID_RANGO
+                 AND d.ESTATUS = TRUE
+                WHERE p.ID_INSUMO IN (SELECT UNNEST(?))
+                  AND p.ESTATUS = TRUE
+                ORDER BY p.ID_INSUMO, p.NUM_PARTE, r.NUM_RANGO, d.INDEX_COL
+            """, (ids,)).fetchall(),
+
+            "validaciones": self.conn.execute("""
+                SELECT ID_INSUMO,
+                       ID_VAL,
+                       VALIDACION,
+                       DESCRIPCION,
+                       GRUPO,
+                       SECCION,
+                       BANDERA
+                FROM MOTOR_VAL
+                WHERE ID_INSUMO IN (SELECT UNNEST(?))
+                  AND TIPO_VAL = 'SLA'
+                  AND ESTATUS = TRUE
+                ORDER BY ID_INSUMO, ID_VAL
+            """, (ids,)).fetchall()
+        }
+
+        plan = PlanConfiguracion(filas)
+
+        if archivo:
+            plan.guardar(archivo)
+            self._podar_cache()
+
+        return plan
+
+    def _podar_cache(self):
+
+        planes = sorted(
+            self.ruta_cache.glob("plan_*.pkl"),
+            key=lambda archivo: archivo.stat().st_mtime,
+            reverse=True
+        )
+
+        for archivo in planes[self.max_planes:]:
+            archivo.unlink(missing_ok=True)
@@ -0,0 +1,203 @@
+# ejecutor_lote.py
+import os
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from almacen_errores import AlmacenErrores, nuevo_run_id
+from config_repository import ConfigRepository
+from ledger_resultados import LedgerResultados
+from orquestador import OrquestadorInsumo
+from source_cache import SourceCache
+
+
+class PresupuestoMemoria:
+    """
+    Tope de memoria compartido por los workers.
+
+    Cuenta las fuentes que el SourceCache tiene parseadas (se registran
+    al cargarlas y se descuentan al sacarlas de la cache) y la proyección
+    de cada tarea en curso. Una tarea reserva su proyección antes de
+    empezar y espera si no cabe mientras otras sigan corriendo; si no
+    corre ninguna entra igual, porque las fuentes cacheadas solo se
+    liberan cuando sus tareas avanzan.
+    """
+
+    def __init__(self, limite_bytes=None):
+        self.limite_bytes = limite_bytes
+        self.en_uso = 0
+        self.tareas = 0
+        self._condicion = threading.Condition()
+
+    def reservar(self, n):
+
+        if not self.limite_bytes:
+            return
+
+        with self._condicion:
+            while self.tareas > 0 and self.en_uso + n > self.limite_bytes:
+                self._condicion.wait()
+            self.en_uso += n
+            self.tareas += 1
+
+    def liberar(self, n):
+
+        if not self.limite_bytes:
+            return
+
+        with self._condicion:
+            self.en_uso -= n
+            self.tareas -= 1
+            self._condicion.notify_all()
+
+    def registrar(self, n):
+        """Suma una fuente ya cargada; quien la carga ya pasó por reservar"""
+
+        if not self.limite_bytes:
+            return
+
+        with self._condicion:
+            self.en_uso += n
+
+    def descontar(self, n):
+
+        if not self.limite_bytes:
+            return
+
+        with self._condicion:
+            self.en_uso -= n
+            self._condicion.notify_all()
+
+
+class EjecutorLote:
+    """
+    Procesa varios insumos repartiendo sus rangos en un pool acotado.
+
+    Polars y DuckDB sueltan el GIL durante el trabajo pesado, así que se
+    usan hilos: comparten el SourceCache (cada archivo se parsea una vez)
+    y cada validador abre su propia conexión DuckDB en memoria.
+    """
+
+    # La proyección tipada de un rango ocupa aproximadamente este múltiplo
+    # de la fracción del archivo en disco que cubren sus columnas
+    FACTOR_PROYECCION = 2
+
+    def __init__(self, ruta_db, ids_insumos=None, max_workers=None,
+                 memoria_max_mb=None, hilos_duckdb=1, ruta_ledger=None,
+                 ruta_errores="errores", perfilar=False):
+
+        self.ruta_db = ruta_db
+        self.ids_insumos = ids_insumos
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.hilos_duckdb = hilos_duckdb
+        self.ruta_ledger = ruta_ledger
+        self.ruta_errores = ruta_errores
+        self.perfilar = perfilar
+
+        limite = memoria_max_mb * 1024 * 1024 if memoria_max_mb else None
+        self.presupuesto = PresupuestoMemoria(limite)
+
+        self.config_duckdb = {"threads": hilos_duckdb}
+        if memoria_max_mb:
+            por_worker = max(memoria_max_mb // self.max_workers, 64)
+            self.config_duckdb["memory_limit"] = f"{por_worker}MB"
+
+    # ================================
+    # EJECUCIÓN
+    # ================================
+
+    def procesar(self):
+
+        with ConfigRepository(self.ruta_db) as repo:
+
+            # 🔹 Una sola carga de configuración para todo el lote
+            plan_lote = repo.cargar_plan(self.ids_insumos)
+            planes = [plan_lote.obtener(id_insumo) for id_insumo in plan_lote.ids_insumos]
+
+        cache = SourceCache(self.presupuesto)
+        run_id = nuevo_run_id()
+        logs = {}
+        resultados = {}
+        pendientes = {}
+        candado = threading.Lock()
+
+        for plan in planes:
+            id_insumo = plan["id_insumo"]
+            logs[id_insumo] = OrquestadorInsumo.crear_log_path(id_insumo)
+            resultados[id_insumo] = [None] * len(plan["tareas"])
+            pendientes[id_insumo] = len(plan["tareas"])
+
+        def ejecutar(plan, idx, tarea, ledger, almacen):
+
+            id_insumo = plan["id_insumo"]
+            estimado = self._estimar_bytes(plan, tarea)
+
+            self.presupuesto.reservar(estimado)
+            try:
+                resultado = OrquestadorInsumo.ejecutar_tarea(
+                    plan, tarea, cache, logs[id_insumo], self.config_duckdb,
+                    ledger=ledger, almacen=almacen, run_id=run_id,
+                    medir_aislado=self.perfilar
+                )
+            except Exception as e:
+                resultado = {
+                    "id_insumo": id_insumo,
+                    "id_parte": tarea["id_parte"],
+                    "id_rango": tarea["id_rango"],
+                    "estructura_ok": False,
+                    "error": str(e),
+                    "reglas": []
+                }
+            finally:
+                self.presupuesto.liberar(estimado)
+
+            with candado:
+                pendientes[id_insumo] -= 1
+                terminado = pendientes[id_insumo] == 0
+
+            # 🔹 El último rango del insumo libera el archivo de la cache
+            if terminado:
+                cache.liberar(plan["insumo"][1])
+
+            return id_insumo, idx, resultado
+
+        with (LedgerResultados(self.ruta_ledger)
+              if self.ruta_ledger else nullcontext()) as ledger, \
+                AlmacenErrores(self.ruta_errores) as almacen, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+
+            futuros = [
+                pool.submit(ejecutar, plan, idx, tarea, ledger, almacen)
+                for plan in planes
+                for idx, tarea in enumerate(plan["tareas"])
+            ]
+
+            for futuro in as_completed(futuros):
+                id_insumo, idx, resultado = futuro.result()
+                resultados[id_insumo][idx] = resultado
+
+        # 🔹 Mismo orden que la ejecución secuencial, sin importar cuál terminó primero
+        for id_insumo, base_log_path in logs.items():
+            OrquestadorInsumo.guardar_log(base_log_path, resultados[id_insumo])
+
+        cache.limpiar()
+
+        print(f"✔ Lote finalizado: {len(planes)} insumos")
+
+        return {id_insumo: str(ruta) for id_insumo, ruta in logs.items()}
+
+    def _estimar_bytes(self, plan, tarea):
+        """
+        Solo la proyección del rango: la fuente completa la registra el
+        SourceCache una vez al parsearla.
+        """
+
+        try:
+            tamano = os.path.getsize(plan["insumo"][1])
+        except OSError:
+            return 0
+
+        columnas_archivo = max(t["col_fin"] for t in plan["tareas"]) + 1
+        columnas_rango = tarea["col_fin"] - tarea["col_ini"] + 1
+
+        return tamano * self.FACTOR_PROYECCION * columnas_rango // columnas_archivo
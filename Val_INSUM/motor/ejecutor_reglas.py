@@ -0,0 +1,207 @@
+# ejecutor_reglas.py
+import hashlib
+import re
+import threading
+import time
+
+import duckdb
+
+
+# Reglas de la forma "SELECT * FROM datos WHERE <condición>" se pueden
+# fusionar: su conteo es COUNT(*) FILTER (WHERE <condición>)
+_PATRON_FUSIONABLE = re.compile(
+    r"^\s*SELECT\s+\*\s+FROM\s+datos\s+WHERE\s+(?P<condicion>.+?)\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+
+# Palabras que cambian la cardinalidad o requieren otro scan
+_PATRON_NO_FUSIONABLE = re.compile(
+    r"\b(SELECT|GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT|OFFSET|UNION|"
+    r"INTERSECT|EXCEPT|JOIN|QUALIFY|OVER)\b",
+    re.IGNORECASE
+)
+
+# Costo (ms) de cada condición fusionada medida sola, por hash de la
+# condición. Se comparte en el proceso: cada condición se mide una vez
+# por corrida aunque aparezca en muchos rangos.
+_TIEMPOS_AISLADOS = {}
+_CANDADO_TIEMPOS = threading.Lock()
+_CLAVE_BASE = "base"
+
+
+class EjecutorReglas:
+    """
+    Ejecuta reglas SLA sobre la tabla 'datos' en dos pasadas:
+
+    1. Conteo: las reglas fusionables se cuentan juntas en uno o pocos
+       scans (COUNT(*) FILTER por regla); el resto con COUNT(*) propio.
+    2. Materialización: solo para reglas con errores, una muestra acotada
+       y el Parquet completo escrito en streaming por DuckDB.
+    """
+
+    def __init__(self, conn, reglas_por_scan=64, medir_aislado=False,
+                 filas_medicion=100_000):
+        self.conn = conn
+        self.reglas_por_scan = reglas_por_scan
+        # Solo al perfilar: medir cada condición fusionada sola cuesta scans extra
+        self.medir_aislado = medir_aislado
+        self.filas_medicion = filas_medicion
+
+    # ============================================
+    # PASADA 1: CONTEO
+    # ============================================
+
+    @staticmethod
+    def condicion_fusionable(query):
+        """Regresa la condición WHERE si la regla se puede fusionar, si no None"""
+        coincidencia = _PATRON_FUSIONABLE.match(query or "")
+        if not coincidencia:
+            return None
+
+        condicion = coincidencia.group("condicion")
+        if _PATRON_NO_FUSIONABLE.search(condicion) or ";" in condicion:
+            return None
+
+        return condicion
+
+    def contar(self, reglas):
+        """
+        Cuenta errores por ID_VAL.
+
+        Args:
+            reglas: Lista de (id_val, query)
+
+        Returns:
+            {id_val: {"total": int, "error": str|None,
+                      "fusionada": bool, "tiempo_ms": float,
+                      "tiempo_estimado": bool}}
+            En reglas fusionadas `tiempo_ms` es la parte estimada del scan
+            compartido y `tiempo_aislado_ms` la medición de la regla sola
+            (None si no se pidió medir_aislado).
+        """
+        conteos = {}
+        fusionables = []
+
+        for id_val, query in reglas:
+            condicion = self.condicion_fusionable(query)
+            if condicion is None:
+                conteos[id_val] = self._contar_individual(id_val, query)
+            else:
+                fusionables.append((id_val, query, condicion))
+
+        for i in range(0, len(fusionables), self.reglas_por_scan):
+            lote = fusionables[i:i + self.reglas_por_scan]
+            conteos.update(self._contar_lote(lote))
+
+        return conteos
+
+    def _contar_lote(self, lote):
+        columnas = ",\n".join(
+            f"COUNT(*) FILTER (WHERE ({condicion})) AS r{idx}"
+            for idx, (_, _, condicion) in enumerate(lote)
+        )
+
+        inicio = time.perf_counter()
+        try:
+            fila = self.conn.execute(f"SELECT {columnas}\nFROM datos").fetchone()
+        except duckdb.Error:
+            # Alguna condición no compila en forma fusionada:
+            # se aísla contando cada regla por separado
+            return {
+                id_val: self._contar_individual(id_val, query)
+                for id_val, query, _ in lote
+            }
+        tiempo_ms = (time.perf_counter() - inicio) * 1000
+
+        # El scan compartido no dice qué regla cuesta más. Con medir_aislado
+        # cada condición se mide sola (una vez por proceso) y el tiempo del
+        # lote se reparte en proporción; sin él, en partes iguales. En ambos
+        # casos el reparto es una estimación.
+        aislados = (
+            [self._tiempo_aislado(condicion) for _, _, condicion in lote]
+            if self.medir_aislado else None
+        )
+        suma = sum(aislados) if aislados else 0
+
+        return {
+            id_val: {
+                "total": int(fila[idx]),
+                "error": None,
+                "fusionada": True,
+                "tiempo_ms": tiempo_ms * (aislados[idx] / suma if suma else 1 / len(lote)),
+                "tiempo_estimado": True,
+                "tiempo_aislado_ms": aislados[idx] if aislados else None
+            }
+            for idx, (id_val, _, _) in enumerate(lote)
+        }
+
+    def _tiempo_aislado(self, condicion):
+        """
+        Costo (ms) de la condición contada sola sobre las primeras
+        `filas_medicion` filas, descontando el recorrido de esas filas
+        """
+        clave = hashlib.sha1(condicion.encode("utf-8")).hexdigest()
+
+        # Se mide con el candado tomado: dos workers no repiten la medición
+        with _CANDADO_TIEMPOS:
+            if clave not in _TIEMPOS_AISLADOS:
+                if _CLAVE_BASE not in _TIEMPOS_AISLADOS:
+                    _TIEMPOS_AISLADOS[_CLAVE_BASE] = self._medir("TRUE")
+                _TIEMPOS_AISLADOS[clave] = max(
+                    self._medir(condicion) - _TIEMPOS_AISLADOS[_CLAVE_BASE], 0.0
+                )
+
+            return _TIEMPOS_AISLADOS[clave]
+
+    def _medir(self, condicion, repeticiones=2):
+        consulta = (
+            f"SELECT COUNT(*) FILTER (WHERE ({condicion})) "
+            f"FROM (SELECT * FROM datos LIMIT {int(self.filas_medicion)}) AS muestra"
+        )
+        mejor = float("inf")
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            self.conn.execute(consulta).fetchone()
+            mejor = min(mejor, (time.perf_counter() - inicio) * 1000)
+        return mejor
+
+    def _contar_individual(self, id_val, query):
+        inicio = time.perf_counter()
+        try:
+            total = self.conn.execute(
+                f"SELECT COUNT(*) FROM ({self._limpiar(query)}) AS regla"
+            ).fetchone()[0]
+            error = None
+        except duckdb.Error as e:
+            total = -1
+            error = str(e)
+
+        return {
+            "total": int(total),
+            "error": error,
+            "fusionada": False,
+            "tiempo_ms": (time.perf_counter() - inicio) * 1000,
+            "tiempo_estimado": False
+        }
+
+    # ============================================
+    # PASADA 2: MATERIALIZACIÓN
+    # ============================================
+
+    def muestra(self, query, limite):
+        """Materializa solo las primeras `limite` filas con error"""
+        return self.conn.execute(
+            f"SELECT * FROM ({self._limpiar(query)}) AS regla LIMIT {int(limite)}"
+        ).pl()
+
+    def exportar_parquet(self, query, archivo):
+        """Escribe todas las filas con error sin pasar por memoria de Python"""
+        destino = str(archivo).replace("'", "''")
+        self.conn.execute(
+            f"COPY ({self._limpiar(query)}) TO '{destino}' "
+            f"(FORMAT PARQUET, COMPRESSION ZSTD)"
+        )
+
+    @staticmethod
+    def _limpiar(query):
+        return query.strip().rstrip(";")
@@ -22,3 +22,29 @@ class FileLoaderFactory:
 
         else:
             raise ValueError("Tipo de archivo no soportado")
+
+    # ================================
+    # CARGA CRUDA (ARROW)
+    # ================================
+
+    @staticmethod
+    def cargar_arrow(ruta, tipo_archivo, hoja=None):
+        """
+        Lee el archivo completo sin aplicar schema (todas las columnas
+        como texto) y lo devuelve como pyarrow.Table. Los rangos se
+        obtienen después proyectando columnas sobre esta tabla.
+        """
+
+        if tipo_archivo == "CSV":
+            df = pl.read_csv(ruta, infer_schema=False)
+
+        elif tipo_archivo == "TXT":
+            df = pl.read_csv(ruta, separator="\t", infer_schema=False)
+
+        elif tipo_archivo == "EXCEL":
+            df = pl.read_excel(ruta, sheet_name=hoja)
+
+        else:
+            raise ValueError("Tipo de archivo no soportado")
+
+        return df.to_arrow()
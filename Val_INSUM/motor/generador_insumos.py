@@ -0,0 +1,188 @@
+# generador_insumos.py
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import polars as pl
+
+
+# Esquema por omisión: (NOMBRE_COLUMN, TIPO_DATO_SYS)
+ESQUEMA_DEFAULT = [
+    ("ID_REGISTRO", "INT"),
+    ("CLIENTE", "STRING"),
+    ("FECHA_OPERACION", "DATE"),
+    ("MONTO", "FLOAT"),
+    ("PLAZO", "INT"),
+    ("MONEDA", "STRING"),
+    ("TASA", "FLOAT"),
+    ("FECHA_VENCIMIENTO", "DATE"),
+]
+
+FILAS_MAX_EXCEL = 1_048_575
+
+
+class GeneradorInsumos:
+    """
+    Genera insumos sintéticos (CSV, TXT o XLSX) con el esquema de un
+    rango de DEFINICION_INSUMOS, más una BD de configuración DuckDB con
+    CAT_INSUMOS / INSUMOS_PARTES / INSUMOS_RANGOS / DEFINICION_INSUMOS /
+    MOTOR_VAL lista para correr el motor.
+
+    Los errores se inyectan como violaciones de reglas (negativos, vacíos,
+    fechas inválidas, duplicados) con probabilidad `tasa_error` por celda,
+    de forma que el cast del esquema siga siendo válido.
+    """
+
+    def __init__(self, esquema=None, tasa_error=0.01, semilla=42,
+                 filas_por_bloque=1_000_000):
+        self.esquema = list(esquema or ESQUEMA_DEFAULT)
+        self.tasa_error = tasa_error
+        self.semilla = semilla
+        self.filas_por_bloque = filas_por_bloque
+
+    @classmethod
+    def desde_config(cls, ruta_db, id_rango, **kwargs):
+        """Toma el esquema de un rango ya configurado en DEFINICION_INSUMOS"""
+
+        with duckdb.connect(str(ruta_db), read_only=True) as conn:
+            esquema = conn.execute("""
+                SELECT NOMBRE_COLUMN, TIPO_DATO_SYS
+                FROM DEFINICION_INSUMOS
+                WHERE ID_RANGO = ?
+                  AND ESTATUS = TRUE
+                ORDER BY INDEX_COL
+            """, (id_rango,)).fetchall()
+
+        return cls(esquema=esquema, **kwargs)
+
+    # ================================
+    # DATOS
+    # ================================
+
+    def _bloque(self, rng, inicio, filas):
+
+        columnas = {}
+        error = lambda: rng.random(filas) < self.tasa_error
+
+        for nombre, tipo in self.esquema:
+
+            if tipo == "INT" and nombre == self.esquema[0][0]:
+                # Llave: el error es repetir el ID de una fila anterior
+                valores = np.arange(inicio, inicio + filas, dtype=np.int64)
+                anteriores = rng.integers(0, np.maximum(valores, 1))
+                valores = np.where(error(), anteriores, valores)
+
+            elif tipo == "INT":
+                valores = rng.integers(1, 10_000, filas)
+                valores = np.where(error(), -valores, valores)
+
+            elif tipo == "FLOAT":
+                valores = np.round(rng.uniform(0, 1_000_000, filas), 2)
+                valores = np.where(error(), -valores, valores)
+
+            elif tipo == "DATE":
+                dias = rng.integers(0, 3650, filas).astype("timedelta64[D]")
+                fechas = (np.datetime64("2015-01-01") + dias).astype(str)
+                valores = np.where(error(), "2024-13-45", fechas)
+
+            else:
+                valores = np.char.add("V", rng.integers(0, 100_000, filas).astype(str))
+                valores = np.where(error(), "", valores)
+
+            columnas[nombre] = valores
+
+        return pl.DataFrame(columnas)
+
+    def generar(self, ruta, tipo_archivo, filas):
+        """Escribe el archivo por bloques para no tener todo en memoria"""
+
+        ruta = Path(ruta)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        rng = np.random.default_rng(self.semilla)
+
+        if tipo_archivo == "EXCEL":
+            if filas > FILAS_MAX_EXCEL:
+                raise ValueError(f"XLSX admite como máximo {FILAS_MAX_EXCEL} filas")
+            self._bloque(rng, 0, filas).write_excel(ruta, autofit=False)
+            return ruta
+
+        separador = "\t" if tipo_archivo == "TXT" else ","
+
+        with open(ruta, "wb") as f:
+            for inicio in range(0, filas, self.filas_por_bloque):
+                n = min(self.filas_por_bloque, filas - inicio)
+                self._bloque(rng, inicio, n).write_csv(
+                    f, separator=separador, include_header=inicio == 0
+                )
+
+        return ruta
+
+    # ================================
+    # CONFIGURACIÓN
+    # ================================
+
+    def reglas(self):
+        """Reglas SLA sintéticas: una por columna más una de duplicados"""
+
+        reglas = []
+        for nombre, tipo in self.esquema:
+            if tipo in ("INT", "FLOAT"):
+                condicion = f'"{nombre}" < 0'
+            elif tipo == "DATE":
+                condicion = f"TRY_STRPTIME(\"{nombre}\", '%Y-%m-%d') IS NULL"
+            else:
+                condicion = f"\"{nombre}\" IS NULL OR \"{nombre}\" = ''"
+            reglas.append((f"SELECT * FROM datos WHERE {condicion}", f"Validación {nombre}"))
+
+        llave = self.esquema[0][0]
+        reglas.append((
+            f'SELECT "{llave}", COUNT(*) AS N FROM datos GROUP BY "{llave}" HAVING COUNT(*) > 1',
+            f"Duplicados {llave}"
+        ))
+
+        return reglas
+
+    def crear_config(self, ruta_db, ruta_archivo, tipo_archivo, id_insumo=1,
+                     hoja="Sheet1"):
+
+        Path(ruta_db).unlink(missing_ok=True)
+
+        with duckdb.connect(str(ruta_db)) as conn:
+
+            conn.execute("""
+                CREATE TABLE CAT_INSUMOS (ID_INSUMO INTEGER, RUTA_ARCHIVO VARCHAR,
+                                          TIPO_ARCHIVO VARCHAR);
+                CREATE TABLE INSUMOS_PARTES (ID_PARTE INTEGER, ID_INSUMO INTEGER,
+                                             NUM_PARTE INTEGER, NOMBRE_PARTE VARCHAR,
+                                             ESTATUS BOOLEAN);
+                CREATE TABLE INSUMOS_RANGOS (ID_RANGO INTEGER, ID_PARTE INTEGER,
+                                             NUM_RANGO INTEGER, NOMBRE_RANGO VARCHAR,
+                                             COL_INICIO INTEGER, COL_FIN INTEGER,
+                                             ESTATUS BOOLEAN);
+                CREATE TABLE DEFINICION_INSUMOS (ID_RANGO INTEGER, INDEX_COL INTEGER,
+                                                 NOMBRE_COLUMN VARCHAR,
+                                                 TIPO_DATO_SYS VARCHAR, ESTATUS BOOLEAN);
+                CREATE TABLE MOTOR_VAL (ID_VAL INTEGER, ID_INSUMO INTEGER,
+                                        TIPO_VAL VARCHAR, VALIDACION VARCHAR,
+                                        DESCRIPCION VARCHAR, GRUPO VARCHAR,
+                                        SECCION VARCHAR, BANDERA VARCHAR,
+                                        ESTATUS BOOLEAN);
+            """)
+
+            conn.execute("INSERT INTO CAT_INSUMOS VALUES (?, ?, ?)",
+                         (id_insumo, str(Path(ruta_archivo).resolve()), tipo_archivo))
+            conn.execute("INSERT INTO INSUMOS_PARTES VALUES (1, ?, 1, ?, TRUE)",
+                         (id_insumo, hoja))
+            conn.execute("INSERT INTO INSUMOS_RANGOS VALUES (1, 1, 1, 'RANGO_1', 0, ?, TRUE)",
+                         (len(self.esquema) - 1,))
+            conn.executemany(
+                "INSERT INTO DEFINICION_INSUMOS VALUES (1, ?, ?, ?, TRUE)",
+                [(i, nombre, tipo) for i, (nombre, tipo) in enumerate(self.esquema)]
+            )
+            conn.executemany(
+                "INSERT INTO MOTOR_VAL VALUES (?, ?, 'SLA', ?, ?, 'BENCH', 'RANGO_1', 'ROJA', TRUE)",
+                [(100 + i, id_insumo, query, descripcion)
+                 for i, (query, descripcion) in enumerate(self.reglas())]
+            )
+
+        return ruta_db
@@ -0,0 +1,201 @@
+# ledger_resultados.py
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+
+
+class LedgerResultados:
+    """
+    Bitácora persistente de resultados por regla.
+
+    Cada resultado se guarda con la llave (hash del contenido del archivo,
+    hash de la configuración del rango, hash de la regla). Si ninguno de
+    los tres cambió desde la última corrida, la regla se responde desde
+    aquí sin volver a leer el archivo ni ejecutar la consulta.
+    """
+
+    TAMANO_BLOQUE = 8 * 1024 * 1024
+
+    def __init__(self, ruta_ledger="ledger.duckdb"):
+        self.ruta_ledger = ruta_ledger
+        self.conn = None
+        self._candado = threading.Lock()
+        self._candados_archivo = {}
+
+    def __enter__(self):
+        self.conn = duckdb.connect(str(self.ruta_ledger))
+        self._crear_tablas()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.conn:
+            self.conn.close()
+
+    def _crear_tablas(self):
+
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS HASH_ARCHIVOS (
+                RUTA VARCHAR PRIMARY KEY,
+                MTIME_NS BIGINT,
+                TAMANO BIGINT,
+                HASH_CONTENIDO VARCHAR
+            )
+        """)
+
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS LEDGER_RESULTADOS (
+                HASH_ARCHIVO VARCHAR,
+                HASH_RANGO VARCHAR,
+                HASH_REGLA VARCHAR,
+                ID_INSUMO INTEGER,
+                ID_PARTE INTEGER,
+                ID_RANGO INTEGER,
+                ID_VAL INTEGER,
+                TOTAL_ERRORES BIGINT,
+                MUESTRA_JSON VARCHAR,
+                RUTA_PARQUET VARCHAR,
+                FECHA_PROCESO TIMESTAMP,
+                PRIMARY KEY (HASH_ARCHIVO, HASH_RANGO, HASH_REGLA)
+            )
+        """)
+
+    # ================================
+    # HASHES
+    # ================================
+
+    def hash_archivo(self, ruta):
+        """
+        Hash del contenido del archivo. Se recalcula solo si cambió
+        (ruta, mtime, tamaño) respecto a la última vez que se leyó.
+        """
+
+        ruta = str(Path(ruta).resolve())
+
+        # Varios rangos del mismo archivo no deben hashearlo en paralelo
+        with self._candado:
+            candado = self._candados_archivo.setdefault(ruta, threading.Lock())
+
+        with candado:
+            return self._hash_archivo(ruta)
+
+    def _hash_archivo(self, ruta):
+
+        stat = os.stat(ruta)
+
+        with self._candado:
+            fila = self.conn.execute("""
+                SELECT HASH_CONTENIDO
+                FROM HASH_ARCHIVOS
+                WHERE RUTA = ? AND MTIME_NS = ? AND TAMANO = ?
+            """, (ruta, stat.st_mtime_ns, stat.st_size)).fetchone()
+
+        if fila:
+            return fila[0]
+
+        h = hashlib.blake2b(digest_size=20)
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(self.TAMANO_BLOQUE), b""):
+                h.update(bloque)
+        contenido = h.hexdigest()
+
+        with self._candado:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO HASH_ARCHIVOS
+                VALUES (?, ?, ?, ?)
+            """, (ruta, stat.st_mtime_ns, stat.st_size, contenido))
+
+        return contenido
+
+    @staticmethod
+    def hash_rango(tarea):
+        firma = (
+            tarea["hoja"],
+            tarea["col_ini"],
+            tarea["col_fin"],
+            tuple((nombre, str(tipo)) for nombre, tipo in tarea["schema"].items())
+        )
+        return hashlib.sha256(repr(firma).encode("utf-8")).hexdigest()[:20]
+
+    @staticmethod
+    def hash_regla(query):
+        # Solo se recortan los extremos: colapsar espacios internos
+        # alteraría literales de texto dentro de la consulta
+        return hashlib.sha256(query.strip().encode("utf-8")).hexdigest()[:20]
+
+    # ================================
+    # CONSULTA / REGISTRO
+    # ================================
+
+    def consultar(self, hash_archivo, hash_rango, validaciones):
+        """
+        Regresa {id_val: {"total_errores", "muestra", "parquet"}} para las
+        reglas que ya tienen resultado con los mismos hashes.
+        """
+
+        # Varias reglas pueden compartir la misma consulta (y el mismo hash)
+        hashes = {}
+        for regla in validaciones:
+            hashes.setdefault(self.hash_regla(regla[1]), []).append(regla[0])
+
+        with self._candado:
+            filas = self.conn.execute("""
+                SELECT HASH_REGLA, TOTAL_ERRORES, MUESTRA_JSON, RUTA_PARQUET
+                FROM LEDGER_RESULTADOS
+                WHERE HASH_ARCHIVO = ?
+                  AND HASH_RANGO = ?
+                  AND HASH_REGLA IN (SELECT UNNEST(?))
+            """, (hash_archivo, hash_rango, list(hashes))).fetchall()
+
+        previos = {}
+        for hash_regla, total, muestra, parquet in filas:
+
+            # El Parquet de errores vive en el log de la corrida original
+            if total > 0 and not (parquet and Path(parquet).exists()):
+                continue
+
+            previo = {
+                "total_errores": total,
+                "muestra": json.loads(muestra) if muestra else [],
+                "parquet": parquet
+            }
+            for id_val in hashes[hash_regla]:
+                previos[id_val] = previo
+
+        return previos
+
+    def registrar(self, hash_archivo, hash_rango, id_insumo, id_parte,
+                  id_rango, validaciones, calculados):
+
+        consultas = {regla[0]: regla[1] for regla in validaciones}
+        fecha = datetime.now()
+
+        filas = [
+            (
+                hash_archivo,
+                hash_rango,
+                self.hash_regla(consultas[id_val]),
+                id_insumo,
+                id_parte,
+                id_rango,
+                id_val,
+                calculado["total_errores"],
+                json.dumps(calculado["muestra"], default=str),
+                calculado["parquet"],
+                fecha
+            )
+            for id_val, calculado in calculados.items()
+        ]
+
+        if not filas:
+            return
+
+        with self._candado:
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO LEDGER_RESULTADOS
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, filas)
@@ -1,10 +1,44 @@
+import argparse
+
 from orquestador import OrquestadorInsumo
+from ejecutor_lote import EjecutorLote
 
 if __name__ == "__main__":
 
-    motor = OrquestadorInsumo(
-        id_insumo=1,
-        ruta_db="config.duckdb"
-    )
+    parser = argparse.ArgumentParser(description="Motor de validación de insumos")
+    parser.add_argument("--db", default="config.duckdb")
+    parser.add_argument("--insumos", type=int, nargs="*",
+                        help="IDs a procesar (default: todos los activos)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Grado de paralelismo (default: núcleos disponibles)")
+    parser.add_argument("--memoria-mb", type=int, default=None,
+                        help="Tope de memoria total para el lote")
+    parser.add_argument("--ledger", default=None,
+                        help="BD DuckDB del ledger para revalidar solo lo que cambió")
+    parser.add_argument("--perfilar", action="store_true",
+                        help="Medir por separado cada regla fusionada (agrega scans)")
+    args = parser.parse_args()
+
+    if args.insumos and len(args.insumos) == 1 and args.workers == 1:
+
+        motor = OrquestadorInsumo(
+            id_insumo=args.insumos[0],
+            ruta_db=args.db,
+            ruta_ledger=args.ledger,
+            perfilar=args.perfilar
+        )
+
+        motor.procesar()
+
+    else:
+
+        lote = EjecutorLote(
+            ruta_db=args.db,
+            ids_insumos=args.insumos,
+            max_workers=args.workers,
+            memoria_max_mb=args.memoria_mb,
+            ruta_ledger=args.ledger,
+            perfilar=args.perfilar
+        )
 
-    motor.procesar()
+        lote.procesar()
@@ -1,69 +1,162 @@
 # orquestador.py
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
 import json
+import time
 
+from almacen_errores import AlmacenErrores, nuevo_run_id
 from config_repository import ConfigRepository
-from file_loader_factory import FileLoaderFactory
+from ledger_resultados import LedgerResultados
+from source_cache import SourceCache
 from validador_sla import ValidadorSLA
 
 
 class OrquestadorInsumo:
 
-    def __init__(self, id_insumo, ruta_db):
+    def __init__(self, id_insumo, ruta_db, ruta_ledger=None,
+                 ruta_errores="errores", perfilar=False):
         self.id_insumo = id_insumo
         self.ruta_db = ruta_db
+        self.ruta_ledger = ruta_ledger
+        self.ruta_errores = ruta_errores
+        self.perfilar = perfilar
 
     def procesar(self):
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        base_log_path = Path("logs") / f"insumo_{self.id_insumo}_{timestamp}"
-        base_log_path.mkdir(parents=True, exist_ok=True)
+        base_log_path = self.crear_log_path(self.id_insumo)
 
         resultados_globales = []
+        cache = SourceCache()
+        run_id = nuevo_run_id()
 
         with ConfigRepository(self.ruta_db) as repo:
+            plan = self.planificar(repo, self.id_insumo)
 
-            insumo = repo.obtener_insumo(self.id_insumo)
-            partes = repo.obtener_partes(self.id_insumo)
-            validaciones = repo.obtener_validaciones_sla(self.id_insumo)
+        with (LedgerResultados(self.ruta_ledger)
+              if self.ruta_ledger else nullcontext()) as ledger, \
+                AlmacenErrores(self.ruta_errores) as almacen:
 
-            for parte in partes:
+            inicio = time.perf_counter()
 
-                id_parte = parte[0]
-                hoja = parte[2]
+            for tarea in plan["tareas"]:
 
-                rangos = repo.obtener_rangos(id_parte)
+                resultado = self.ejecutar_tarea(
+                    plan, tarea, cache, base_log_path, ledger=ledger,
+                    almacen=almacen, run_id=run_id, medir_aislado=self.perfilar
+                )
+                resultados_globales.append(resultado)
 
-                for rango in rangos:
+            tareas_ms = (time.perf_counter() - inicio) * 1000
+            inicio = time.perf_counter()
 
-                    id_rango, _, _, col_ini, col_fin = rango
+        cache.limpiar()
 
-                    schema = repo.obtener_definicion_columnas(id_rango)
+        self.guardar_log(base_log_path, resultados_globales)
 
-                    df = FileLoaderFactory.cargar(
-                        ruta=insumo[1],
-                        tipo_archivo=insumo[2],
-                        schema=schema,
-                        hoja=hoja
-                    )
+        escritura_ms = (time.perf_counter() - inicio) * 1000
 
-                    df_rango = df[:, col_ini:col_fin + 1]
+        print("✔ Proceso finalizado")
 
-                    with ValidadorSLA(
-                        self.id_insumo,
-                        id_parte,
-                        id_rango,
-                        df_rango,
-                        validaciones,
-                        base_log_path
-                    ) as val:
+        return {
+            "run_id": run_id,
+            "log": str(base_log_path / "log.json"),
+            "tiempos": {
+                "carga_ms": round(cache.tiempos["carga_ms"], 3),
+                "cast_ms": round(cache.tiempos["cast_ms"], 3),
+                "reglas_ms": round(
+                    tareas_ms - cache.tiempos["carga_ms"] - cache.tiempos["cast_ms"], 3
+                ),
+                "escritura_ms": round(escritura_ms, 3)
+            }
+        }
+
+    # ================================
+    # PLAN
+    # ================================
+
+    @staticmethod
+    def planificar(repo, id_insumo):
+        """
+        Configuración del insumo aplanada en una lista de tareas (una por
+        rango), en el orden NUM_PARTE / NUM_RANGO.
+        """
+
+        return repo.cargar_plan([id_insumo]).obtener(id_insumo)
+
+    # ================================
+    # TAREA (RANGO)
+    # ================================
+
+    @staticmethod
+    def ejecutar_tarea(plan, tarea, cache, base_log_path, config_duckdb=None,
+                       ledger=None, almacen=None, run_id=None, medir_aislado=False):
+
+        insumo = plan["insumo"]
+        validaciones = plan["validaciones"]
+
+        # 🔹 Reglas ya resueltas para este mismo archivo / rango / regla
+        previos = {}
+        if ledger:
+            hash_archivo = ledger.hash_archivo(insumo[1])
+            hash_rango = ledger.hash_rango(tarea)
+            previos = ledger.consultar(hash_archivo, hash_rango, validaciones)
+
+        df_rango = None
+        if len(previos) < len(validaciones):
+
+            # 🔹 El archivo se parsea una sola vez por corrida
+            df_rango = cache.obtener_rango(
+                ruta=insumo[1],
+                tipo_archivo=insumo[2],
+                col_ini=tarea["col_ini"],
+                col_fin=tarea["col_fin"],
+                schema=tarea["schema"],
+                hoja=tarea["hoja"]
+            )
+
+        with ValidadorSLA(
+            plan["id_insumo"],
+            tarea["id_parte"],
+            tarea["id_rango"],
+            df_rango,
+            validaciones,
+            base_log_path,
+            config_duckdb=config_duckdb,
+            previos=previos,
+            almacen=almacen,
+            run_id=run_id,
+            medir_aislado=medir_aislado
+        ) as val:
+
+            resultado = val.procesar()
+            resultado["run_id"] = run_id
+
+            if ledger:
+                ledger.registrar(
+                    hash_archivo, hash_rango, plan["id_insumo"],
+                    tarea["id_parte"], tarea["id_rango"],
+                    validaciones, val.calculados
+                )
+
+            return resultado
+
+    # ================================
+    # LOGS
+    # ================================
+
+    @staticmethod
+    def crear_log_path(id_insumo):
 
-                        resultado = val.procesar()
-                        resultados_globales.append(resultado)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        base_log_path = Path("logs") / f"insumo_{id_insumo}_{timestamp}"
+        base_log_path.mkdir(parents=True, exist_ok=True)
 
-        # 🔹 Guardar JSON general
-        with open(base_log_path / "log.json", "w", encoding="utf-8") as f:
-            json.dump(resultados_globales, f, indent=4, default=str)
+        return base_log_path
 
-        print("✔ Proceso finalizado")
+    @staticmethod
+    def guardar_log(base_log_path, resultados):
+
+        # 🔹 Guardar JSON general (compacto; las filas con error van al almacén)
+        with open(base_log_path / "log.json", "w", encoding="utf-8") as f:
+            json.dump(resultados, f, default=str, separators=(",", ":"))
@@ -0,0 +1,133 @@
+# plan_configuracion.py
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from types import MappingProxyType
+
+import polars as pl
+
+
+MAPEO_TIPOS = {
+    "INT": pl.Int64,
+    "STRING": pl.Utf8,
+    "DATE": pl.Utf8,
+    "FLOAT": pl.Float64
+}
+
+
+class PlanConfiguracion:
+    """
+    Configuración completa (insumo, partes, rangos, columnas y reglas SLA)
+    de uno o varios insumos, armada a partir de las filas crudas de unas
+    pocas consultas. Es de solo lectura: cada plan por insumo es un
+    mappingproxy y sus listas son tuplas.
+    """
+
+    def __init__(self, filas):
+        self._filas = filas
+        self._planes = MappingProxyType(self._armar(filas))
+
+    # ================================
+    # CONSTRUCCIÓN
+    # ================================
+
+    @staticmethod
+    def _armar(filas):
+
+        planes = {}
+
+        validaciones = {}
+        for id_insumo, *regla in filas["validaciones"]:
+            validaciones.setdefault(id_insumo, []).append(tuple(regla))
+
+        tareas = {}
+        for (id_insumo, id_parte, hoja, id_rango,
+             col_ini, col_fin, nombre, tipo) in filas["estructura"]:
+
+            por_insumo = tareas.setdefault(id_insumo, {})
+            tarea = por_insumo.get(id_rango)
+
+            if tarea is None:
+                tarea = por_insumo[id_rango] = {
+                    "id_parte": id_parte,
+                    "hoja": hoja,
+                    "id_rango": id_rango,
+                    "col_ini": col_ini,
+                    "col_fin": col_fin,
+                    "schema": {}
+                }
+
+            if nombre is not None:
+                tarea["schema"][nombre] = MAPEO_TIPOS.get(tipo, pl.Utf8)
+
+        for insumo in filas["insumos"]:
+
+            id_insumo = insumo[0]
+
+            planes[id_insumo] = MappingProxyType({
+                "id_insumo": id_insumo,
+                "insumo": tuple(insumo),
+                "validaciones": tuple(validaciones.get(id_insumo, ())),
+                "tareas": tuple(
+                    MappingProxyType(t)
+                    for t in tareas.get(id_insumo, {}).values()
+                )
+            })
+
+        return planes
+
+    # ================================
+    # CONSULTA
+    # ================================
+
+    @property
+    def ids_insumos(self):
+        return tuple(self._planes.keys())
+
+    def obtener(self, id_insumo):
+
+        plan = self._planes.get(id_insumo)
+
+        if plan is None:
+            raise ValueError(f"Insumo {id_insumo} no encontrado en el plan")
+
+        return plan
+
+    # ================================
+    # CACHE EN DISCO
+    # ================================
+
+    @staticmethod
+    def version(ruta_db, ids_insumos=None):
+        """
+        Hash de versión de la configuración: cambia cuando la BD de
+        configuración se modifica en disco o cambia el conjunto pedido.
+        """
+
+        stat = os.stat(ruta_db)
+        firma = (
+            str(Path(ruta_db).resolve()),
+            stat.st_mtime_ns,
+            stat.st_size,
+            tuple(sorted(ids_insumos)) if ids_insumos else None
+        )
+
+        return hashlib.sha256(repr(firma).encode("utf-8")).hexdigest()[:16]
+
+    def guardar(self, archivo):
+
+        archivo = Path(archivo)
+        archivo.parent.mkdir(parents=True, exist_ok=True)
+
+        temporal = archivo.with_suffix(".tmp")
+        with open(temporal, "wb") as f:
+            pickle.dump(self._filas, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temporal, archivo)
+
+    @classmethod
+    def cargar(cls, archivo):
+
+        with open(archivo, "rb") as f:
+            return cls(pickle.load(f))
@@ -0,0 +1,135 @@
+# source_cache.py
+import os
+import threading
+import time
+from pathlib import Path
+
+import polars as pl
+
+from file_loader_factory import FileLoaderFactory
+
+
+class SourceCache:
+    """
+    Cache de archivos fuente ya parseados durante una corrida.
+
+    La llave es (ruta, mtime, tamaño, hoja): si el archivo cambia en
+    disco la entrada deja de coincidir y se vuelve a leer. Es seguro
+    compartirlo entre hilos: cada fuente se parsea una sola vez aunque
+    varios rangos la pidan al mismo tiempo.
+
+    Con un presupuesto de memoria, cada fuente registra su tamaño en Arrow
+    una sola vez al cargarse y lo descuenta al salir de la cache.
+    """
+
+    def __init__(self, presupuesto=None):
+        self.presupuesto = presupuesto
+        self._fuentes = {}
+        self._reservas = {}
+        self._candados = {}
+        self._candado = threading.Lock()
+
+        # Tiempo acumulado de parseo de archivos y de proyección + cast
+        self.tiempos = {"carga_ms": 0.0, "cast_ms": 0.0}
+
+    # ================================
+    # LLAVE
+    # ================================
+
+    @staticmethod
+    def _llave(ruta, hoja):
+        ruta = Path(ruta).resolve()
+        stat = os.stat(ruta)
+        return (str(ruta), stat.st_mtime_ns, stat.st_size, hoja)
+
+    # ================================
+    # FUENTE
+    # ================================
+
+    def obtener(self, ruta, tipo_archivo, hoja=None):
+
+        # Para CSV/TXT la hoja no aplica: un solo parseo sirve a todas las partes
+        hoja = hoja if tipo_archivo == "EXCEL" else None
+        llave = self._llave(ruta, hoja)
+
+        with self._candado:
+            candado = self._candados.setdefault(llave, threading.Lock())
+
+        with candado:
+            tabla = self._fuentes.get(llave)
+
+            if tabla is None:
+                inicio = time.perf_counter()
+                tabla = FileLoaderFactory.cargar_arrow(ruta, tipo_archivo, hoja)
+                self._fuentes[llave] = tabla
+                self._acumular("carga_ms", inicio)
+                self._registrar(llave, tabla.nbytes)
+
+        return tabla
+
+    # ================================
+    # RANGO
+    # ================================
+
+    def obtener_rango(self, ruta, tipo_archivo, col_ini, col_fin,
+                      schema, hoja=None):
+        """
+        Proyecta las columnas col_ini..col_fin (sin copiar buffers) y
+        aplica el schema de DEFINICION_INSUMOS sobre la proyección.
+        """
+
+        tabla = self.obtener(ruta, tipo_archivo, hoja)
+
+        inicio = time.perf_counter()
+        proyeccion = tabla.select(list(range(col_ini, col_fin + 1)))
+        df = pl.from_arrow(proyeccion)
+
+        if schema:
+            df = df.rename(dict(zip(df.columns, schema.keys())))
+            df = df.cast(schema)
+
+        self._acumular("cast_ms", inicio)
+
+        return df
+
+    def _acumular(self, etapa, inicio):
+        with self._candado:
+            self.tiempos[etapa] += (time.perf_counter() - inicio) * 1000
+
+    # ================================
+    # MEMORIA
+    # ================================
+
+    def _registrar(self, llave, n):
+
+        if self.presupuesto is None:
+            return
+
+        with self._candado:
+            self._reservas[llave] = n
+        self.presupuesto.registrar(n)
+
+    def _descontar(self, llaves):
+
+        liberados = sum(self._reservas.pop(llave, 0) for llave in llaves)
+
+        if self.presupuesto is not None and liberados:
+            self.presupuesto.descontar(liberados)
+
+    def liberar(self, ruta):
+        """Descarta todas las hojas cacheadas de un archivo"""
+
+        ruta = str(Path(ruta).resolve())
+
+        with self._candado:
+            llaves = [k for k in self._fuentes if k[0] == ruta]
+            for llave in llaves:
+                self._fuentes.pop(llave, None)
+                self._candados.pop(llave, None)
+            self._descontar(llaves)
+
+    def limpiar(self):
+        with self._candado:
+            self._descontar(list(self._reservas))
+            self._fuentes.clear()
+            self._candados.clear()
@@ -1,9 +1,11 @@
 # validador_sla.py
 import duckdb
-import json
+import time
 from datetime import datetime
 from pathlib import Path
 
+from ejecutor_reglas import EjecutorReglas
+
 
 class ValidadorSLA:
 
@@ -13,7 +15,13 @@ class ValidadorSLA:
                  id_rango,
                  df,
                  validaciones,
-                 base_log_path):
+                 base_log_path,
+                 tamano_muestra=10,
+                 config_duckdb=None,
+                 previos=None,
+                 almacen=None,
+                 run_id=None,
+                 medir_aislado=False):
 
         self.id_insumo = id_insumo
         self.id_parte = id_parte
@@ -21,6 +29,19 @@ class ValidadorSLA:
         self.df = df
         self.validaciones = validaciones
         self.base_log_path = Path(base_log_path)
+        self.tamano_muestra = tamano_muestra
+        self.config_duckdb = config_duckdb or {}
+
+        # Resultados ya conocidos (ledger) y los calculados en esta corrida
+        self.previos = previos or {}
+        self.calculados = {}
+
+        # Dataset consolidado de errores; sin él se escribe un Parquet por regla
+        self.almacen = almacen
+        self.run_id = run_id
+
+        # Perfilado: medir cada regla fusionada sola (scans extra)
+        self.medir_aislado = medir_aislado
 
         self.conn = None
 
@@ -38,8 +59,10 @@ class ValidadorSLA:
         self.total_errores = 0
 
     def __enter__(self):
-        self.conn = duckdb.connect(":memory:")
-        self.conn.register("datos", self.df.to_arrow())
+        self.conn = duckdb.connect(":memory:", config=self.config_duckdb)
+        # Sin df cuando todas las reglas vienen del ledger
+        if self.df is not None:
+            self.conn.register("datos", self.df.to_arrow())
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
@@ -52,25 +75,58 @@ class ValidadorSLA:
 
     def procesar(self):
 
+        ejecutor = EjecutorReglas(self.conn, medir_aislado=self.medir_aislado)
+
+        # 🔹 Pasada 1: conteo de errores de todas las reglas
+        inicio = time.perf_counter()
+        conteos = ejecutor.contar(
+            [(regla[0], regla[1]) for regla in self.validaciones
+             if regla[0] not in self.previos]
+        )
+        tiempo_conteo_ms = (time.perf_counter() - inicio) * 1000
+
+        # 🔹 Pasada 2: materializar solo reglas con errores
         for regla in self.validaciones:
 
             id_val, query, descripcion, grupo, seccion, bandera = regla
 
             self.total_reglas += 1
 
-            resultado = self.conn.execute(query).pl()
-            total = resultado.height
+            previo = self.previos.get(id_val)
+            if previo is not None:
+                self._agregar_previo(regla, previo)
+                continue
+
+            conteo = conteos[id_val]
+            total = conteo["total"]
+
+            if conteo["error"]:
+                self.resultado["estructura_ok"] = False
+                self.resultado["reglas"].append({
+                    "id_val": id_val,
+                    "descripcion": descripcion,
+                    "total_errores": -1,
+                    "error": conteo["error"]
+                })
+                continue
+
+            if total == 0:
+                self.calculados[id_val] = {
+                    "total_errores": 0, "muestra": [], "parquet": None
+                }
 
             if total > 0:
 
                 self.reglas_con_error += 1
                 self.total_errores += total
 
+                inicio = time.perf_counter()
+
                 # 🔹 Guardar parquet completo
-                self._guardar_parquet(id_val, resultado)
+                archivo = self._guardar_parquet(ejecutor, id_val, query)
 
                 # 🔹 Guardar muestra en JSON
-                muestra = resultado.head(10).to_dicts()
+                muestra = ejecutor.muestra(query, self.tamano_muestra).to_dicts()
 
                 self.resultado["reglas"].append({
                     "id_val": id_val,
@@ -79,22 +135,73 @@ class ValidadorSLA:
                     "seccion": seccion,
                     "bandera": bandera,
                     "total_errores": total,
-                    "muestra": muestra
+                    "muestra": muestra,
+                    "fusionada": conteo["fusionada"],
+                    "tiempo_conteo_ms": round(conteo["tiempo_ms"], 3),
+                    "tiempo_estimado": conteo["tiempo_estimado"],
+                    "tiempo_materializacion_ms": round(
+                        (time.perf_counter() - inicio) * 1000, 3
+                    )
                 })
 
+                self.calculados[id_val] = {
+                    "total_errores": total,
+                    "muestra": muestra,
+                    "parquet": str(archivo)
+                }
+
         self.resultado["resumen"] = {
             "total_reglas": self.total_reglas,
             "reglas_con_error": self.reglas_con_error,
-            "total_errores_detectados": self.total_errores
+            "total_errores_detectados": self.total_errores,
+            "reglas_fusionadas": sum(c["fusionada"] for c in conteos.values()),
+            "reglas_desde_ledger": len(self.previos),
+            "tiempo_conteo_ms": round(tiempo_conteo_ms, 3)
         }
 
         return self.resultado
 
+    def _agregar_previo(self, regla, previo):
+
+        id_val, _, descripcion, grupo, seccion, bandera = regla
+        total = previo["total_errores"]
+
+        if total <= 0:
+            return
+
+        # La corrida no reescribe las filas: apunta a la partición que ya las tiene
+        if self.almacen is not None and previo["parquet"]:
+            self.almacen.referenciar(
+                self.run_id, self.id_insumo, self.id_parte, self.id_rango,
+                id_val, previo["parquet"]
+            )
+
+        self.reglas_con_error += 1
+        self.total_errores += total
+
+        self.resultado["reglas"].append({
+            "id_val": id_val,
+            "descripcion": descripcion,
+            "grupo": grupo,
+            "seccion": seccion,
+            "bandera": bandera,
+            "total_errores": total,
+            "muestra": previo["muestra"],
+            "desde_ledger": True,
+            "parquet": previo["parquet"]
+        })
+
     # ==========================================
     # PARQUET
     # ==========================================
 
-    def _guardar_parquet(self, id_val, df):
+    def _guardar_parquet(self, ejecutor, id_val, query):
+
+        if self.almacen is not None:
+            return self.almacen.agregar(
+                self.conn, query, self.run_id,
+                self.id_insumo, self.id_parte, self.id_rango, id_val
+            )
 
         ruta = (self.base_log_path /
                 f"parte_{self.id_parte}" /
@@ -104,7 +211,6 @@ class ValidadorSLA:
 
         archivo = ruta / f"regla_{id_val}.parquet"
 
-        df.write_parquet(
-            archivo,
-            compression="zstd"
-        )
+        ejecutor.exportar_parquet(query, archivo)
+
+        return archivo
@@ -1,6 +1,9 @@
 # fabrica_cargador_archivos.py
 import polars as pl
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from pathlib import Path
+from typing import Iterator
 
 
 class FabricaCargadorArchivos:
@@ -65,3 +68,59 @@ class FabricaCargadorArchivos:
         
         else:
             raise ValueError(f"Tipo de archivo no soportado: {tipo_archivo}")
+    
+    @staticmethod
+    def leer_por_lotes(ruta: str, tipo_archivo: str, col_ini: int, col_fin: int,
+                       tamano_lote: int = 500_000) -> Iterator[pa.Table]:
+        """
+        Lee un CSV/TXT en streaming y entrega bloques de `tamano_lote` filas
+        (el último puede ser menor) con solo las columnas col_ini..col_fin,
+        todas como texto. La memoria usada queda acotada por el tamaño del lote.
+        
+        Args:
+            ruta: Ruta al archivo
+            tipo_archivo: CSV o TXT
+            col_ini, col_fin: Rango de columnas (inclusivo, base 0)
+            tamano_lote: Filas por bloque
+        
+        Returns:
+            Iterator[pa.Table]: Bloques de filas
+        """
+        if not Path(ruta).exists():
+            raise FileNotFoundError(f"Archivo no encontrado: {ruta}")
+        
+        if tipo_archivo not in ("CSV", "TXT"):
+            raise ValueError(f"Lectura por lotes no soportada para: {tipo_archivo}")
+        
+        # pyarrow nombra f0, f1, ... cuando no hay encabezados
+        columnas = [f"f{i}" for i in range(col_ini, col_fin + 1)]
+        
+        lector = pa_csv.open_csv(
+            ruta,
+            read_options=pa_csv.ReadOptions(autogenerate_column_names=True),
+            parse_options=pa_csv.ParseOptions(
+                delimiter="\t" if tipo_archivo == "TXT" else ","
+            ),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=columnas,
+                column_types={c: pa.string() for c in columnas}
+            )
+        )
+        
+        pendientes = []
+        filas = 0
+        
+        for lote in lector:
+            pendientes.append(lote)
+            filas += lote.num_rows
+            
+            while filas >= tamano_lote:
+                tabla = pa.Table.from_batches(pendientes)
+                yield tabla.slice(0, tamano_lote)
+                
+                resto = tabla.slice(tamano_lote)
+                pendientes = resto.to_batches()
+                filas = resto.num_rows
+        
+        if filas:
+            yield pa.Table.from_batches(pendientes)